@@ -12,33 +12,241 @@ Commands inside the game:
   moves e2     # list legal moves from e2 on your turn
   quit         # exit
 """
-from typing import List, Tuple, Optional
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional
 
 WHITE, BLACK = 'w', 'b'
-Piece = Tuple[str, str]  # (color, type)
-
-# Board is List[List[Optional[Piece]]] with (row 0 at 8th rank)
-def initial_board() -> List[List[Optional[Piece]]]:
-    back = ['r','n','b','q','k','b','n','r']
-    board: List[List[Optional[Piece]]] = []
-    board.append([(BLACK, p) for p in back])
-    board.append([(BLACK, 'p') for _ in range(8)])
-    for _ in range(4):
-        board.append([None for _ in range(8)])
-    board.append([(WHITE, 'p') for _ in range(8)])
-    board.append([(WHITE, p) for p in back])
+Piece = int  # WP..BK, also the piece's bitboard index
+
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+# White pieces first, then black, each in PAWN..KING order
+WP, WN, WB, WR, WQ, WK, BP, BN, BB, BR, BQ, BK = range(12)
+PIECE_COLOR = [WHITE] * 6 + [BLACK] * 6
+PIECE_TYPE = list(range(6)) * 2
+PIECE_CHARS = 'PNBRQKpnbrqk'
+
+# Square index is r*8+c, with row 0 at the 8th rank (same as the (r, c) coordinates)
+BB_SQUARES = [1 << (r * 8 + c) for r in range(8) for c in range(8)]
+
+# ZOB[piece][sq]: random 64-bit keys; a position's Zobrist hash is the XOR of its pieces' keys
+_zob_rng = random.Random(0x5EED)
+ZOB = [[_zob_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+
+@dataclass
+class Board:
+    pieces: List[int]  # 12 bitboards indexed by WP..BK
+    occupied_white: int = 0
+    occupied_black: int = 0
+    occupied: int = 0
+    king_pos: Dict[str, int] = field(default_factory=dict)  # color -> king square
+    zobrist: int = 0
+    squares: List[Optional[int]] = field(default_factory=lambda: [None] * 64)  # sq -> piece index
+    attacks: Dict[str, int] = field(default_factory=dict)  # color -> squares it attacks
+
+def _toggle(board, i, sq):
+    bit = BB_SQUARES[sq]
+    board.pieces[i] ^= bit
+    board.zobrist ^= ZOB[i][sq]
+    board.squares[sq] = None if board.squares[sq] == i else i
+    board.occupied ^= bit
+    if i < 6:
+        board.occupied_white ^= bit
+    else:
+        board.occupied_black ^= bit
+
+def initial_board() -> Board:
+    back = [WR, WN, WB, WQ, WK, WB, WN, WR]
+    board = Board([0] * 12)
+    for c, p in enumerate(back):
+        _toggle(board, p + BP, c)
+        _toggle(board, BP, 8 + c)
+        _toggle(board, WP, 48 + c)
+        _toggle(board, p, 56 + c)
+    board.king_pos = {WHITE: 7 * 8 + 4, BLACK: 4}
+    _update_attacks(board)
     return board
 
 def in_bounds(r: int, c: int) -> bool:
-    return 0 <= r < 8 and 0 <= c < 8
+    # both coordinates fit in 3 bits; negatives set the high bits too
+    return not (r | c) & ~7
 
-def find_king(board, color):
+def _leaper_table(offsets) -> List[int]:
+    table = []
     for r in range(8):
         for c in range(8):
-            p = board[r][c]
-            if p and p[0] == color and p[1] == 'k':
-                return (r, c)
-    return None
+            bb = 0
+            for dr, dc in offsets:
+                if in_bounds(r + dr, c + dc):
+                    bb |= BB_SQUARES[(r + dr) * 8 + c + dc]
+            table.append(bb)
+    return table
+
+KNIGHT_OFFSETS = ((2,1),(1,2),(-1,2),(-2,1),(-2,-1),(-1,-2),(1,-2),(2,-1))
+KING_OFFSETS = ((1,1),(1,-1),(-1,1),(-1,-1),(1,0),(-1,0),(0,1),(0,-1))
+KNIGHT_ATTACKS = _leaper_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _leaper_table(KING_OFFSETS)
+# Squares attacked by a pawn of the given color standing on the square
+PAWN_ATTACKS = {
+    WHITE: _leaper_table([(-1, -1), (-1, 1)]),
+    BLACK: _leaper_table([(1, -1), (1, 1)]),
+}
+
+# Slider directions are indices into DIRECTIONS (the same steps as KING_OFFSETS)
+DIRECTIONS = KING_OFFSETS
+BISHOP_DIRS = (0, 1, 2, 3)
+ROOK_DIRS = (4, 5, 6, 7)
+QUEEN_DIRS = BISHOP_DIRS + ROOK_DIRS
+
+def _ray(r, c, dr, dc) -> List[int]:
+    squares = []
+    rr, cc = r + dr, c + dc
+    while in_bounds(rr, cc):
+        squares.append(rr * 8 + cc)
+        rr += dr; cc += dc
+    return squares
+
+# RAYS[d][sq]: squares walked from sq in DIRECTIONS[d], nearest first
+RAYS = [[_ray(r, c, dr, dc) for r in range(8) for c in range(8)] for dr, dc in DIRECTIONS]
+
+MASK64 = (1 << 64) - 1
+
+# Magic bitboards for sliding attacks: ((occupancy & MASK) * MAGIC) >> SHIFT indexes a
+# per-square table of attack sets. The magics were found by an offline random search
+# for this square layout.
+BISHOP_MAGICS = [
+    0x2240081a22902100, 0x8020055224950082, 0x20100c04a7220384, 0x004820a020000400,
+    0x0e14052000008006, 0x0005140240000002, 0x00a0420805400800, 0x0202021042021000,
+    0xa0580488b0142080, 0x8102024404043040, 0x8180086204002004, 0x4220181481040202,
+    0x8000420210000000, 0x80002088a0080404, 0x0000084808241200, 0x040004422a100200,
+    0x0044041010104140, 0x1021280222040100, 0x00480040820010a2, 0x0088000082004011,
+    0x8084000200944000, 0x0441a00a00842050, 0x0401100c00821028, 0x0040210304022e40,
+    0x0004200110321042, 0x104a300408010818, 0x0000280810004044, 0x0008080000820002,
+    0x0115004094044001, 0x2941090012100091, 0x0841084202021004, 0x00020048008400ba,
+    0x100802b0000a2024, 0x000402680c200100, 0x4000109005280840, 0x0001020080880080,
+    0x0448020400001100, 0x0004180020021000, 0x0010016100004400, 0x0040911200004a10,
+    0x1802011040000808, 0x4021080230c90210, 0x0944101088001000, 0xc000082018000108,
+    0x800420220c000081, 0x0804408801100200, 0x4802080a0c110080, 0x2201440102000040,
+    0x1041080110488404, 0x1010248608210001, 0x030012020f044148, 0x0000001f04090082,
+    0x0000000410440400, 0x20000490224a0000, 0x021020010402b844, 0x8004012401020000,
+    0x1000288200a02004, 0x0010a444041c1302, 0x000000004210900c, 0x1106202240208820,
+    0x0080200110020880, 0x0008080820080082, 0x0800a00801082881, 0x8020940408182820,
+]
+ROOK_MAGICS = [
+    0x0080002080400010, 0x0440100020004004, 0x0200088420120040, 0x0280080080100254,
+    0x4d8004000a180080, 0x0100080400020100, 0x1080010040800200, 0x0200004402002081,
+    0x0068800024884004, 0x1000804000802002, 0x000200208a001040, 0x3008801000800800,
+    0x2006001060440a00, 0x1000800200800400, 0x0004000441024810, 0xa001000082004100,
+    0x0040808000204014, 0x0000424002201000, 0x0010110041002000, 0x0000090021041000,
+    0x0204008004800800, 0x0000808004000200, 0x6006040021485042, 0x0000020002409924,
+    0x2000401980028020, 0x4000400100308100, 0x0000820200201041, 0xb100100080800800,
+    0x3004080080040080, 0x0802000200041009, 0x01a0580400021110, 0x00020042000408a1,
+    0x4218884000800023, 0x0480201000400045, 0x0010200080801000, 0x1200200901001000,
+    0x0000100801000500, 0x0080020080800400, 0x004a000100404080, 0x0480005402001081,
+    0x258000402000c000, 0xa010004820084002, 0x0480200010008080, 0x244100100021000c,
+    0x2040080005010010, 0x0012000810020004, 0x0011000200b9000c, 0x1121000080410002,
+    0x00082080410a0600, 0x4002008100402600, 0x0a0300e008544100, 0x7b00080010008080,
+    0x0300080100100500, 0x0002020080040080, 0x0042521810214400, 0x8a00004089140200,
+    0x00001280010a2041, 0x0400401102042086, 0x41902000100c4101, 0x0043020420900009,
+    0x00e2000410082002, 0x4402000108041002, 0x2100101a00814804, 0x0400010400218246,
+]
+
+# RAY_MASK[sq][d]: the squares of RAYS[d][sq] as one bitboard
+RAY_MASK = [[sum(BB_SQUARES[s] for s in RAYS[d][sq]) for d in range(8)] for sq in range(64)]
+# rays heading to higher square indices meet their nearest blocker at the lowest set bit
+RAY_ASCENDING = [dr * 8 + dc > 0 for dr, dc in DIRECTIONS]
+
+def _sliding_attacks(sq, occ, dirs) -> int:
+    attacks = 0
+    for d in dirs:
+        ray = RAY_MASK[sq][d]
+        blockers = ray & occ
+        if blockers:
+            if RAY_ASCENDING[d]:
+                first = (blockers & -blockers).bit_length() - 1
+            else:
+                first = blockers.bit_length() - 1
+            # everything beyond the first blocker is shadowed by it
+            ray ^= RAY_MASK[first][d]
+        attacks |= ray
+    return attacks
+
+def _magic_tables(magics, dirs):
+    masks, shifts, tables = [], [], []
+    for sq in range(64):
+        # the last square of a ray never blocks anything, so it is left out of the mask
+        mask = 0
+        for d in dirs:
+            for s in RAYS[d][sq][:-1]:
+                mask |= BB_SQUARES[s]
+        shift = 64 - bin(mask).count('1')
+        table = [0] * (1 << (64 - shift))
+        occ = 0
+        while True:
+            idx = ((occ * magics[sq]) & MASK64) >> shift
+            attacks = _sliding_attacks(sq, occ, dirs)
+            if table[idx] and table[idx] != attacks:
+                raise ValueError("bad magic for square %d" % sq)
+            table[idx] = attacks
+            occ = (occ - mask) & mask
+            if not occ:
+                break
+        masks.append(mask)
+        shifts.append(shift)
+        tables.append(table)
+    return masks, shifts, tables
+
+def _line_tables():
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for sq in range(64):
+        for d in QUEEN_DIRS:
+            dr, dc = DIRECTIONS[d]
+            full = RAY_MASK[sq][d] | RAY_MASK[sq][DIRECTIONS.index((-dr, -dc))] | BB_SQUARES[sq]
+            for s in RAYS[d][sq]:
+                between[sq][s] = RAY_MASK[sq][d] & ~RAY_MASK[s][d] & ~BB_SQUARES[s]
+                line[sq][s] = full
+    return between, line
+
+# BETWEEN[a][b]: squares strictly between two aligned squares; LINE[a][b]: the whole
+# line through them, edge to edge. Both are 0 when a and b share no line.
+BETWEEN, LINE = _line_tables()
+
+BISHOP_MASK, BISHOP_SHIFT, BISHOP_ATTACKS = _magic_tables(BISHOP_MAGICS, BISHOP_DIRS)
+ROOK_MASK, ROOK_SHIFT, ROOK_ATTACKS = _magic_tables(ROOK_MAGICS, ROOK_DIRS)
+
+def bishop_attacks(sq, occ) -> int:
+    return BISHOP_ATTACKS[sq][(((occ & BISHOP_MASK[sq]) * BISHOP_MAGICS[sq]) & MASK64) >> BISHOP_SHIFT[sq]]
+
+def rook_attacks(sq, occ) -> int:
+    return ROOK_ATTACKS[sq][(((occ & ROOK_MASK[sq]) * ROOK_MAGICS[sq]) & MASK64) >> ROOK_SHIFT[sq]]
+
+def _squares(bb):
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+# Per-square destination lists for the leapers, so move generation needs no bit scan
+KNIGHT_TARGETS = [list(_squares(bb)) for bb in KNIGHT_ATTACKS]
+KING_TARGETS = [list(_squares(bb)) for bb in KING_ATTACKS]
+PAWN_ATTACK_TARGETS = {color: [list(_squares(bb)) for bb in table] for color, table in PAWN_ATTACKS.items()}
+# Pawn pushes: the single-step destination (None on the last row) and, from the
+# starting row only, the double-step destination
+PAWN_PUSH = {
+    WHITE: [sq - 8 if sq >= 8 else None for sq in range(64)],
+    BLACK: [sq + 8 if sq < 56 else None for sq in range(64)],
+}
+PAWN_DOUBLE = {
+    WHITE: [sq - 16 if 48 <= sq < 56 else None for sq in range(64)],
+    BLACK: [sq + 16 if 8 <= sq < 16 else None for sq in range(64)],
+}
+
+def piece_at(board, r, c) -> Optional[Piece]:
+    return board.squares[r * 8 + c]
+
+def find_king(board, color) -> int:
+    return board.king_pos[color]
 
 def algebraic_to_rc(s: str) -> Tuple[int, int]:
     file = ord(s[0].lower()) - ord('a')
@@ -51,184 +259,279 @@ def rc_to_algebraic(r: int, c: int) -> str:
     return file + rank
 
 def copy_board(board):
-    return [row.copy() for row in board]
-
-def is_square_attacked(board, r, c, by_color) -> bool:
-    # Pawn attacks
-    dir = -1 if by_color == WHITE else 1
-    for dc in (-1, 1):
-        rr = r - dir
-        cc = c + dc
-        if in_bounds(rr, cc):
-            p = board[rr][cc]
-            if p and p[0] == by_color and p[1] == 'p':
-                return True
-    # Knights
-    for dr, dc in [(2,1),(1,2),(-1,2),(-2,1),(-2,-1),(-1,-2),(1,-2),(2,-1)]:
-        rr, cc = r + dr, c + dc
-        if in_bounds(rr, cc):
-            p = board[rr][cc]
-            if p and p[0] == by_color and p[1] == 'n':
-                return True
-    # Bishops/Queens diagonals
-    for dr, dc in [(1,1),(1,-1),(-1,1),(-1,-1)]:
-        rr, cc = r + dr, c + dc
-        while in_bounds(rr, cc):
-            p = board[rr][cc]
-            if p:
-                if p[0] == by_color and (p[1] == 'b' or p[1] == 'q'):
-                    return True
-                break
-            rr += dr; cc += dc
-    # Rooks/Queens orthogonal
-    for dr, dc in [(1,0),(-1,0),(0,1),(0,-1)]:
-        rr, cc = r + dr, c + dc
-        while in_bounds(rr, cc):
-            p = board[rr][cc]
-            if p:
-                if p[0] == by_color and (p[1] == 'r' or p[1] == 'q'):
-                    return True
-                break
-            rr += dr; cc += dc
-    # King
-    for dr in (-1, 0, 1):
-        for dc in (-1, 0, 1):
-            if dr == 0 and dc == 0: 
-                continue
-            rr, cc = r + dr, c + dc
-            if in_bounds(rr, cc):
-                p = board[rr][cc]
-                if p and p[0] == by_color and p[1] == 'k':
-                    return True
+    return Board(board.pieces.copy(), board.occupied_white, board.occupied_black, board.occupied,
+                 board.king_pos.copy(), board.zobrist, board.squares.copy(), board.attacks.copy())
+
+def is_square_attacked(board, sq, by_color) -> bool:
+    pcs = board.pieces
+    o = 0 if by_color == WHITE else 6
+    # Leapers first: each is a single table lookup
+    if KING_ATTACKS[sq] & pcs[o + KING]:
+        return True
+    # Pawn attacks: look from sq as if it held a pawn of the other color
+    if PAWN_ATTACKS[BLACK if by_color == WHITE else WHITE][sq] & pcs[o + PAWN]:
+        return True
+    if KNIGHT_ATTACKS[sq] & pcs[o + KNIGHT]:
+        return True
+    # Sliders: index [0] is the empty-board attack set, so the magic lookup only
+    # runs when a slider actually stands on one of sq's lines
+    queens = pcs[o + QUEEN]
+    occ = board.occupied
+    diag = pcs[o + BISHOP] | queens
+    if diag & BISHOP_ATTACKS[sq][0]:
+        idx = (((occ & BISHOP_MASK[sq]) * BISHOP_MAGICS[sq]) & MASK64) >> BISHOP_SHIFT[sq]
+        if BISHOP_ATTACKS[sq][idx] & diag:
+            return True
+    ortho = pcs[o + ROOK] | queens
+    if ortho & ROOK_ATTACKS[sq][0]:
+        idx = (((occ & ROOK_MASK[sq]) * ROOK_MAGICS[sq]) & MASK64) >> ROOK_SHIFT[sq]
+        if ROOK_ATTACKS[sq][idx] & ortho:
+            return True
     return False
 
-def legal_moves_from(board, r, c, color, last_move=None):
-    p = board[r][c]
-    if not p or p[0] != color:
-        return []
-    typ = p[1]
-    moves = []
-
-    def add_move(rr, cc):
-        # simulate to avoid self-check
-        b2 = copy_board(board)
-        b2[rr][cc] = b2[r][c]
-        b2[r][c] = None
-        kr, kc = find_king(b2, color)
-        enemy = WHITE if color == BLACK else BLACK
-        if not is_square_attacked(b2, kr, kc, enemy):
-            moves.append((rr, cc))
-
-    if typ == 'p':
-        dir = -1 if color == WHITE else 1
-        start_row = 6 if color == WHITE else 1
-        # single push
-        rr, cc = r + dir, c
-        if in_bounds(rr, cc) and board[rr][cc] is None:
-            add_move(rr, cc)
-            # double push
-            rr2 = r + 2 * dir
-            if r == start_row and board[rr2][cc] is None:
-                add_move(rr2, cc)
-        # captures
-        for dc in (-1, 1):
-            rr, cc = r + dir, c + dc
-            if in_bounds(rr, cc) and board[rr][cc] and board[rr][cc][0] != color:
-                add_move(rr, cc)
-        # (no en passant here)
-    elif typ == 'n':
-        for dr, dc in [(2,1),(1,2),(-1,2),(-2,1),(-2,-1),(-1,-2),(1,-2),(2,-1)]:
-            rr, cc = r + dr, c + dc
-            if in_bounds(rr, cc) and (board[rr][cc] is None or board[rr][cc][0] != color):
-                add_move(rr, cc)
-    elif typ in ('b', 'r', 'q'):
-        dirs = []
-        if typ in ('b', 'q'):
-            dirs += [(1,1),(1,-1),(-1,1),(-1,-1)]
-        if typ in ('r', 'q'):
-            dirs += [(1,0),(-1,0),(0,1),(0,-1)]
-        for dr, dc in dirs:
-            rr, cc = r + dr, c + dc
-            while in_bounds(rr, cc):
-                if board[rr][cc] is None:
-                    add_move(rr, cc)
-                else:
-                    if board[rr][cc][0] != color:
-                        add_move(rr, cc)
-                    break
-                rr += dr; cc += dc
-    elif typ == 'k':
-        for dr in (-1, 0, 1):
-            for dc in (-1, 0, 1):
-                if dr == 0 and dc == 0:
-                    continue
-                rr, cc = r + dr, c + dc
-                if in_bounds(rr, cc) and (board[rr][cc] is None or board[rr][cc][0] != color):
-                    add_move(rr, cc)
-        # (no castling here)
-    return moves
+# Pseudo-legal destinations per piece type; _legal_targets filters out self-check
+
+def _pawn_moves(sq, color, own, other):
+    occ = own | other
+    targets = []
+    # single push
+    to = PAWN_PUSH[color][sq]
+    if to is not None and not occ & BB_SQUARES[to]:
+        targets.append(to)
+        # double push
+        to2 = PAWN_DOUBLE[color][sq]
+        if to2 is not None and not occ & BB_SQUARES[to2]:
+            targets.append(to2)
+    # captures
+    for to in PAWN_ATTACK_TARGETS[color][sq]:
+        if other & BB_SQUARES[to]:
+            targets.append(to)
+    # (no en passant here)
+    return targets
+
+def _knight_moves(sq, color, own, other):
+    bits = BB_SQUARES
+    return [to for to in KNIGHT_TARGETS[sq] if not own & bits[to]]
+
+def _bishop_moves(sq, color, own, other):
+    return _squares(bishop_attacks(sq, own | other) & ~own)
+
+def _rook_moves(sq, color, own, other):
+    return _squares(rook_attacks(sq, own | other) & ~own)
+
+def _queen_moves(sq, color, own, other):
+    occ = own | other
+    return _squares((bishop_attacks(sq, occ) | rook_attacks(sq, occ)) & ~own)
+
+def _king_moves(sq, color, own, other):
+    # (no castling here)
+    bits = BB_SQUARES
+    return [to for to in KING_TARGETS[sq] if not own & bits[to]]
+
+# indexed by PAWN..KING
+_GEN = [_pawn_moves, _knight_moves, _bishop_moves, _rook_moves, _queen_moves, _king_moves]
+
+def attack_set(board, color, occ) -> int:
+    # every square attacked by color's pieces, with sliders blocked by occ
+    pcs = board.pieces
+    o = 0 if color == WHITE else 6
+    squares, pawn_attacks, knight_attacks = _squares, PAWN_ATTACKS[color], KNIGHT_ATTACKS
+    bishop, rook = bishop_attacks, rook_attacks
+    attacks = KING_ATTACKS[board.king_pos[color]]
+    for s in squares(pcs[o + PAWN]):
+        attacks |= pawn_attacks[s]
+    for s in squares(pcs[o + KNIGHT]):
+        attacks |= knight_attacks[s]
+    queens = pcs[o + QUEEN]
+    for s in squares(pcs[o + BISHOP] | queens):
+        attacks |= bishop(s, occ)
+    for s in squares(pcs[o + ROOK] | queens):
+        attacks |= rook(s, occ)
+    return attacks
+
+def _update_attacks(board):
+    # Each side's map sees through the other king, so a king stepping back along a
+    # checking slider's line still counts as attacked
+    occ = board.occupied
+    board.attacks = {
+        WHITE: attack_set(board, WHITE, occ ^ BB_SQUARES[board.king_pos[BLACK]]),
+        BLACK: attack_set(board, BLACK, occ ^ BB_SQUARES[board.king_pos[WHITE]]),
+    }
+
+def _check_info(board, color):
+    # (pinned, evasions): color's pieces pinned to its king, and the squares a non-king
+    # move has to land on (everywhere when not in check, nowhere in double check)
+    pcs = board.pieces
+    if color == WHITE:
+        own, o = board.occupied_white, 6
+    else:
+        own, o = board.occupied_black, 0
+    occ = board.occupied
+    king_sq = board.king_pos[color]
+    queens = pcs[o + QUEEN]
+    diag = pcs[o + BISHOP] | queens
+    ortho = pcs[o + ROOK] | queens
+    checkers = ((PAWN_ATTACKS[color][king_sq] & pcs[o + PAWN])
+                | (KNIGHT_ATTACKS[king_sq] & pcs[o + KNIGHT])
+                | (bishop_attacks(king_sq, occ) & diag)
+                | (rook_attacks(king_sq, occ) & ortho))
+    pinned = 0
+    between = BETWEEN[king_sq]
+    for s in _squares((BISHOP_ATTACKS[king_sq][0] & diag) | (ROOK_ATTACKS[king_sq][0] & ortho)):
+        blockers = between[s] & occ
+        # exactly one piece between the slider and the king, and it is ours
+        if blockers & own and not blockers & (blockers - 1):
+            pinned |= blockers
+    if not checkers:
+        evasions = MASK64
+    elif checkers & (checkers - 1):
+        evasions = 0
+    else:
+        # capture the checker or block its line
+        evasions = checkers | between[checkers.bit_length() - 1]
+    return pinned, evasions
+
+def _legal_targets(board, sq, color, pinned, evasions):
+    # yields destination squares lazily, so callers can stop at the first legal move
+    moving = board.squares[sq]
+    if moving is None or PIECE_COLOR[moving] != color:
+        return
+    typ = PIECE_TYPE[moving]
+    bits = BB_SQUARES
+    if color == WHITE:
+        own, other, enemy = board.occupied_white, board.occupied_black, BLACK
+    else:
+        own, other, enemy = board.occupied_black, board.occupied_white, WHITE
+    if typ == KING:
+        # the enemy attack map is kept up to date by move(); it already looks through
+        # this king, so it cannot hide behind itself from a slider
+        danger = board.attacks[enemy]
+        for to in _king_moves(sq, color, own, other):
+            if not danger & bits[to]:
+                yield to
+        return
+    # Any other move is legal exactly when it resolves a check (if there is one) and,
+    # for a pinned piece, stays on the line through the king
+    allowed = evasions
+    if pinned & bits[sq]:
+        allowed &= LINE[board.king_pos[color]][sq]
+    if not allowed:
+        return
+    for to in _GEN[typ](sq, color, own, other):
+        if allowed & bits[to]:
+            yield to
+
+# Shared (r, c) and (src, dst) tuples, so listing moves allocates no new tuples
+SQUARE_RC = [divmod(sq, 8) for sq in range(64)]
+MOVE_RC = [[(SQUARE_RC[a], SQUARE_RC[b]) for b in range(64)] for a in range(64)]
+
+def legal_moves_from(board, r, c, color, last_move=None, out=None):
+    # appends to out when given, so callers can reuse one list
+    if out is None:
+        out = []
+    if (r | c) & ~7:
+        return out
+    pinned, evasions = _check_info(board, color)
+    for to in _legal_targets(board, r * 8 + c, color, pinned, evasions):
+        out.append(SQUARE_RC[to])
+    return out
+
+# (zobrist, color) -> legal moves; positions repeat across the checkmate/stalemate/move calls of a turn
+_MOVE_CACHE: Dict[Tuple[int, str], list] = {}
+_MOVE_CACHE_SIZE = 1024
+
+def all_legal_moves_into(board, color, out):
+    key = (board.zobrist, color)
+    res = _MOVE_CACHE.get(key)
+    if res is None:
+        res = []
+        append, targets, move_rc = res.append, _legal_targets, MOVE_RC
+        pinned, evasions = _check_info(board, color)
+        own = board.occupied_white if color == WHITE else board.occupied_black
+        for sq in _squares(own):
+            pairs = move_rc[sq]
+            for to in targets(board, sq, color, pinned, evasions):
+                append(pairs[to])
+        if len(_MOVE_CACHE) >= _MOVE_CACHE_SIZE:
+            _MOVE_CACHE.clear()
+        _MOVE_CACHE[key] = res
+    out.extend(res)
+    return out
 
 def all_legal_moves(board, color):
-    res = []
-    for r in range(8):
-        for c in range(8):
-            p = board[r][c]
-            if p and p[0] == color:
-                ms = legal_moves_from(board, r, c, color)
-                for rr, cc in ms:
-                    res.append(((r, c), (rr, cc)))
-    return res
+    return all_legal_moves_into(board, color, [])
+
+def has_any_legal_move(board, color) -> bool:
+    res = _MOVE_CACHE.get((board.zobrist, color))
+    if res is not None:
+        return bool(res)
+    pinned, evasions = _check_info(board, color)
+    own = board.occupied_white if color == WHITE else board.occupied_black
+    for sq in _squares(own):
+        for _ in _legal_targets(board, sq, color, pinned, evasions):
+            return True
+    return False
 
 def move(board, src, dst, color) -> Tuple[bool, str]:
     r1, c1 = algebraic_to_rc(src)
     r2, c2 = algebraic_to_rc(dst)
     if not in_bounds(r1, c1) or not in_bounds(r2, c2):
         return False, "Out of bounds."
-    p = board[r1][c1]
-    if not p or p[0] != color:
+    p = piece_at(board, r1, c1)
+    if p is None or PIECE_COLOR[p] != color:
         return False, "No piece of yours on source."
     ms = legal_moves_from(board, r1, c1, color)
     if (r2, c2) not in ms:
         return False, "Illegal move."
-    piece = board[r1][c1]
-    board[r1][c1] = None
+    s, d = r1 * 8 + c1, r2 * 8 + c2
+    captured = board.squares[d]
+    if captured is not None:
+        _toggle(board, captured, d)
+    _toggle(board, p, s)
     # auto-queen promotion
-    if piece[1] == 'p' and (r2 == 0 or r2 == 7):
-        board[r2][c2] = (color, 'q')
-    else:
-        board[r2][c2] = piece
+    if PIECE_TYPE[p] == PAWN and (r2 == 0 or r2 == 7):
+        p += QUEEN - PAWN
+    elif PIECE_TYPE[p] == KING:
+        board.king_pos[color] = d
+    _toggle(board, p, d)
+    _update_attacks(board)
     return True, "OK"
 
 def in_check(board, color) -> bool:
-    kr, kc = find_king(board, color)
     enemy = WHITE if color == BLACK else BLACK
-    return is_square_attacked(board, kr, kc, enemy)
+    return bool(board.attacks[enemy] & BB_SQUARES[find_king(board, color)])
 
 def is_checkmate(board, color) -> bool:
     if not in_check(board, color):
         return False
-    return len(all_legal_moves(board, color)) == 0
+    return not has_any_legal_move(board, color)
 
 def is_stalemate(board, color) -> bool:
     if in_check(board, color):
         return False
-    return len(all_legal_moves(board, color)) == 0
+    return not has_any_legal_move(board, color)
+
+def game_status(board, color) -> str:
+    # one check test and one legal-move existence test cover everything main() reports
+    check = in_check(board, color)
+    if has_any_legal_move(board, color):
+        return 'check' if check else 'ok'
+    return 'checkmate' if check else 'stalemate'
 
 def board_str(board) -> str:
-    s = "  +-----------------+\n"
+    parts = ["  +-----------------+\n"]
     for r in range(8):
-        s += str(8 - r) + " |"
+        parts.append(str(8 - r) + " |")
         for c in range(8):
-            p = board[r][c]
-            if not p:
-                s += " ."
+            p = piece_at(board, r, c)
+            if p is None:
+                parts.append(" .")
             else:
-                ch = p[1].upper() if p[0] == WHITE else p[1]
-                s += " " + ch
-        s += " |\n"
-    s += "  +-----------------+\n"
-    s += "    a b c d e f g h\n"
-    return s
+                parts.append(" " + PIECE_CHARS[p])
+        parts.append(" |\n")
+    parts.append("  +-----------------+\n")
+    parts.append("    a b c d e f g h\n")
+    return "".join(parts)
 
 def main():
     board = initial_board()
@@ -237,14 +540,15 @@ def main():
     print("Commands: 'moves e2' to list moves; 'quit' to exit.\n")
     while True:
         print(board_str(board))
-        if is_checkmate(board, turn):
+        status = game_status(board, turn)
+        if status == 'checkmate':
             print(("White" if turn == WHITE else "Black"), "is checkmated.",
                   ("Black" if turn == WHITE else "White"), "wins!")
             break
-        if is_stalemate(board, turn):
+        if status == 'stalemate':
             print("Stalemate. Draw.")
             break
-        if in_check(board, turn):
+        if status == 'check':
             print(("White" if turn == WHITE else "Black"), "to move — CHECK.")
         else:
             print(("White" if turn == WHITE else "Black"), "to move.")